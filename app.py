@@ -1,6 +1,9 @@
 import streamlit as st
+import asyncio
 import os
+import re
 import sys
+import threading
 from langchain_core.messages import HumanMessage, AIMessage, SystemMessage
 
 # --- Project Structure Setup ---
@@ -8,19 +11,142 @@ from langchain_core.messages import HumanMessage, AIMessage, SystemMessage
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '.')))
 
 # --- Module Imports ---
-from models.llm import get_chatgroq_model
+from models.llm import get_chatgroq_model, get_chatgroq_small_model
 from models.embeddings import get_huggingface_embeddings
-from utils.rag_utils import get_or_create_vector_store, get_context_from_rag
-from utils.search_utils import perform_web_search
+from models.reranker import get_cross_encoder_reranker
+from utils.rag_utils import get_or_create_vector_store, get_context_from_rag, SemanticQueryCache, RAG_ERROR_MESSAGE
+from utils.search_utils import aperform_web_search, create_search_session, WEB_SEARCH_ERROR_MESSAGE, SEARCH_CACHE_TTL
+
+# --- Background event loop (cached so every rerun and session shares one loop) ---
+@st.cache_resource
+def get_loop_and_session():
+    """
+    Starts an event loop on a daemon thread and opens a long-lived HTTP session on it,
+    so async clients (aiohttp, Groq) keep their connection pools across reruns.
+    """
+    loop = asyncio.new_event_loop()
+    threading.Thread(target=loop.run_forever, daemon=True).start()
+    session = asyncio.run_coroutine_threadsafe(create_search_session(), loop).result()
+    return loop, session
+
+def run_async_in_background(coro):
+    """
+    Schedules a coroutine on the background loop and returns a concurrent future.
+    Async calls on the cached clients (e.g. ChatGroq.ainvoke) must go through here:
+    their connection pools are bound to the first loop they run on, so awaiting them
+    under a fresh asyncio.run loop fails with "Event loop is closed" on later turns.
+    """
+    loop, _ = get_loop_and_session()
+    return asyncio.run_coroutine_threadsafe(coro, loop)
+
+# --- Neighborhoods with a description file in the data folder ---
+NEIGHBORHOODS = (
+    "koramangala", "hsr layout", "indiranagar", "jayanagar", "whitefield",
+    "marathahalli", "electronic city", "jp nagar", "majestic", "nagasandra",
+)
+# Single precompiled pattern so a prompt is scanned once for any neighborhood
+AREA_RE = re.compile(r"\b(" + "|".join(map(re.escape, NEIGHBORHOODS)) + r")\b", re.IGNORECASE)
+
+# --- Greetings and small talk that don't need the knowledge base / web search ---
+SMALL_TALK_RE = re.compile(
+    r"^(?:hi|hii+|hello|hey|hiya|yo|thanks|thank you|thx|ty|ok|okay|cool|great|nice|bye|goodbye"
+    r"|good (?:morning|afternoon|evening|night))"
+    r"(?:\s+(?:there|again|so much|a lot|for (?:the|your) help))?[\s!.,?]*$"
+)
+# Prompts shorter than this are treated as small talk too
+MIN_RETRIEVAL_PROMPT_LENGTH = 3
+
+def should_retrieve(prompt_lc):
+    """
+    Cheap heuristic that skips RAG and web search only for greetings and small talk,
+    and retrieves for everything else (expects a lowercased prompt).
+    """
+    prompt_lc = prompt_lc.strip()
+    return len(prompt_lc) >= MIN_RETRIEVAL_PROMPT_LENGTH and not SMALL_TALK_RE.match(prompt_lc)
 
 # --- NEW FEATURE: Function to format chat history for the LLM ---
+ROLE_LABELS = {HumanMessage: "User", AIMessage: "Assistant"}
+
 def format_chat_history(messages):
     """Formats the chat history into a readable string for the LLM."""
+    return "\n".join(f"{ROLE_LABELS.get(type(msg), 'System')}: {msg.content}" for msg in messages)
+
+# --- Upper bound on how long a turn waits for the web search ---
+WEB_SEARCH_TIMEOUT = 2.0
+WEB_SEARCH_TIMEOUT_MESSAGE = "(web search skipped: timeout)"
+
+# --- Chat history sent to the LLM: running summary + most recent messages ---
+HISTORY_WINDOW = 6
+HISTORY_KEEP = 4
+HISTORY_MAX_VERBATIM = 2 * HISTORY_WINDOW
+
+def _apply_finished_summary():
+    """Stores the result of a background summary update once it has finished, without waiting."""
+    future = st.session_state.get("summary_future")
+    if future is None or not future.done():
+        return
+    st.session_state.summary_future = None
+    try:
+        st.session_state.summary = future.result().content
+        st.session_state.summarized_count = st.session_state.summary_upto
+    except Exception as e:
+        # The same messages are retried on the next turn
+        print(f"Error summarizing chat history: {e}")
+
+def schedule_history_summary(messages, summary_model):
+    """
+    Once the unsummarized history grows past HISTORY_WINDOW messages, starts folding all
+    but the last HISTORY_KEEP of them into the running summary on the background loop,
+    so the update is ready for a later turn instead of delaying this one.
+    """
+    _apply_finished_summary()
+    if st.session_state.get("summary_future") is not None:
+        return
+    summarized_count = st.session_state.get("summarized_count", 0)
+    if len(messages) - summarized_count <= HISTORY_WINDOW:
+        return
+
+    summary_upto = len(messages) - HISTORY_KEEP
+    summary_prompt = f"""
+    Update the running summary of a conversation between a user and an AI rental assistant.
+    Keep the user's requirements (budget, BHK, areas, preferences) and any properties they liked or rejected.
+    Reply with the updated summary only.
+
+    Current Summary:
+    ---
+    {st.session_state.get("summary", "None yet.")}
+    ---
+
+    New Messages:
+    ---
+    {format_chat_history(messages[summarized_count:summary_upto])}
+    ---
+    """
+    st.session_state.summary_upto = summary_upto
+    st.session_state.summary_future = run_async_in_background(
+        summary_model.ainvoke([HumanMessage(content=summary_prompt)])
+    )
+
+def get_history_for_llm(messages):
+    """
+    Returns the chat history to send to the LLM: the running summary, if any, plus the
+    messages it doesn't cover yet (at most HISTORY_MAX_VERBATIM if summaries keep failing).
+    """
+    _apply_finished_summary()
+    summarized_count = max(st.session_state.get("summarized_count", 0), len(messages) - HISTORY_MAX_VERBATIM)
+
     history = []
-    for msg in messages:
-        role = "User" if isinstance(msg, HumanMessage) else "Assistant"
-        history.append(f"{role}: {msg.content}")
-    return "\n".join(history)
+    if st.session_state.get("summary"):
+        history.append(SystemMessage(content=f"Summary of the earlier conversation: {st.session_state.summary}"))
+    history.extend(messages[summarized_count:])
+    return history
+
+# --- Neighborhood descriptions (cached so reruns don't re-read from disk) ---
+@st.cache_data
+def load_neighborhood(area: str) -> str:
+    """Loads the description file for a neighborhood from the data folder."""
+    with open(os.path.join("data", f"{area}.txt"), "r") as f:
+        return f.read()
 
 # --- Main App Logic ---
 
@@ -58,6 +184,8 @@ def chat_page():
             st.session_state.messages = [
                 AIMessage(content="Hello! How can I help you find your next home in Bangalore today?")
             ]
+            for key in ("summary", "summarized_count", "summary_future", "summary_upto"):
+                st.session_state.pop(key, None)
             # Rerun the app to reflect the changes immediately
             st.rerun()
 
@@ -70,13 +198,25 @@ def chat_page():
             embeddings = get_huggingface_embeddings()
             # This now loads the index if it exists, or creates it if it doesn't.
             vector_store = get_or_create_vector_store("data", embeddings)
+            # Reranks the dense retrieval candidates before they reach the LLM.
+            # Retrieval falls back to plain dense top-k if it can't be loaded.
+            try:
+                reranker = get_cross_encoder_reranker()
+            except Exception as e:
+                st.warning(f"Reranker unavailable, using plain similarity search: {e}")
+                reranker = None
             chat_model = get_chatgroq_model()
-            return vector_store, chat_model
+            # Match scores and shortlists don't need the large model
+            small_chat_model = get_chatgroq_small_model()
+            # Reuses fetched contexts for near-duplicate questions. Cached web context
+            # expires on the same schedule as the web search cache, so it is never served stale.
+            query_cache = SemanticQueryCache(vector_store, ttl=SEARCH_CACHE_TTL) if vector_store else None
+            return vector_store, reranker, chat_model, small_chat_model, query_cache
         except Exception as e:
             st.error(f"Error loading resources: {e}")
-            return None, None
+            return None, None, None, None, None
 
-    vector_store, chat_model = load_resources()
+    vector_store, reranker, chat_model, small_chat_model, query_cache = load_resources()
 
     if not chat_model:
         st.warning("Could not initialize the chat model. Please check your API keys and configuration.")
@@ -104,8 +244,11 @@ def chat_page():
         with st.chat_message("user"):
             st.markdown(prompt)
 
+        # Lowercase the prompt once for all the checks below
+        prompt_lc = prompt.lower()
+
         # --- NEW FEATURE: Conversation Summary & Property Shortlist ---
-        if prompt.strip().lower() == '/shortlist':
+        if prompt_lc.strip() == '/shortlist':
             with st.chat_message("assistant"):
                 with st.spinner("Analyzing your conversation to create a shortlist..."):
                     chat_history_str = format_chat_history(st.session_state.messages)
@@ -123,7 +266,7 @@ def chat_page():
                     """
                     
                     try:
-                        summary_response = chat_model.invoke([HumanMessage(content=summary_prompt)])
+                        summary_response = small_chat_model.invoke([HumanMessage(content=summary_prompt)])
                         response_content = summary_response.content
                     except Exception as e:
                         response_content = f"Sorry, I encountered an error while creating your shortlist: {e}"
@@ -135,75 +278,127 @@ def chat_page():
         else:
             with st.chat_message("assistant"):
                 with st.spinner("Searching for the perfect place..."):
-                    # 1. Get context from RAG
-                    rag_context = get_context_from_rag(vector_store, prompt) if vector_store else "No local knowledge base found."
-
-                    # 2. Get context from Web Search
-                    search_context = perform_web_search(f"rental properties Bangalore {prompt}")
-
-                    # 3. Construct a detailed system prompt with all context
-                    system_prompt = f"""
-                    You are an expert AI real estate assistant for Bangalore. Your goal is to help the user find a rental property.
-                    You must use the provided context to answer the user's query.
-
-                    **Response Mode:** Please provide a {response_mode} response.
-
-                    **Context from my Knowledge Base (Neighborhood Info & Listings):**
-                    ---
-                    {rag_context}
-                    ---
-
-                    **Context from a Live Web Search (Current Info):**
-                    ---
-                    {search_context}
-                    ---
-
-                    Based on all the above information, answer the user's query.
-                    Synthesize the information from the knowledge base and the web search into a single, helpful, conversational response.
-                    If you use information from the web, mention that it's from a "real-time search."
-                    """
-
-                    try:
-                        # Prepare messages for the model
-                        formatted_messages = [SystemMessage(content=system_prompt)]
-                        formatted_messages.extend(st.session_state.messages)
-
-                        # Get response from model
-                        response = chat_model.invoke(formatted_messages)
-                        response_content = response.content
-
-                        # --- NEW FEATURE: Check for Neighborhood Match Score ---
-                        if st.session_state.user_preferences and any(area.lower() in prompt.lower() for area in ["koramangala", "hsr layout", "indiranagar", "jayanagar", "whitefield", "marathahalli", "electronic city", "jp nagar", "majestic", "nagasandra"]):
-                            # Find which area was mentioned
-                            mentioned_area = next((area for area in ["koramangala", "hsr layout", "indiranagar", "jayanagar", "whitefield", "marathahalli", "electronic city", "jp nagar", "majestic", "nagasandra"] if area.lower() in prompt.lower()), None)
-                            
-                            if mentioned_area:
-                                with st.spinner(f"Calculating match score for {mentioned_area.title()}..."):
-                                    try:
-                                        # Load neighborhood description
-                                        with open(f"data/{mentioned_area.replace(' ', '_')}.txt", "r") as f:
-                                            neighborhood_desc = f.read()
-
-                                        score_prompt = f"""
-                                        Based on the user's preferences and the neighborhood description, provide a match score.
-                                        User Preferences: "{st.session_state.user_preferences}"
-                                        Neighborhood Description for {mentioned_area.title()}: "{neighborhood_desc}"
-                                        
-                                        On a scale of 1 to 10, how well does this neighborhood match the user's preferences?
-                                        Provide the score and a single, concise sentence explaining your reasoning.
-                                        Format your response as: **Match Score for {mentioned_area.title()}: [Score]/10** \n [Your reasoning].
-                                        """
-                                        score_response = chat_model.invoke([HumanMessage(content=score_prompt)])
-                                        # Append the score to the main response
-                                        response_content += "\n\n---\n\n" + score_response.content
-                                    except Exception as e:
-                                        response_content += f"\n\n---\n\nCould not calculate match score due to an error: {e}"
-
-                    except Exception as e:
-                        response_content = f"Sorry, I encountered an error: {e}"
-
+                    # 1 & 2. Get context from RAG and Web Search concurrently
+                    _, search_session = get_loop_and_session()
+
+                    async def search_with_timeout(query):
+                        # A stalled search shouldn't hold up the answer
+                        try:
+                            return await asyncio.wait_for(aperform_web_search(query, session=search_session), WEB_SEARCH_TIMEOUT)
+                        except asyncio.TimeoutError:
+                            return WEB_SEARCH_TIMEOUT_MESSAGE
+
+                    async def fetch_contexts():
+                        if vector_store:
+                            # FAISS search is sync, so run it in a worker thread
+                            rag_task = asyncio.to_thread(get_context_from_rag, vector_store, prompt, reranker=reranker)
+                        else:
+                            rag_task = asyncio.sleep(0, result="No local knowledge base found.")
+                        search_task = search_with_timeout(f"rental properties Bangalore {prompt}")
+                        return await asyncio.gather(rag_task, search_task)
+
+                    needs_context = should_retrieve(prompt_lc)
+                    cached_contexts = query_cache.lookup(prompt) if needs_context and query_cache else None
+
+                    if not needs_context:
+                        # Greetings and small talk skip both lookups entirely
+                        rag_context = search_context = "Not needed for this message."
+                    elif cached_contexts:
+                        rag_context, search_context = cached_contexts
+                    else:
+                        rag_context, search_context = run_async_in_background(fetch_contexts()).result()
+                        # Only cache real results, so a failed or timed-out lookup isn't reused for similar questions
+                        if query_cache and rag_context is not None and search_context not in (None, WEB_SEARCH_TIMEOUT_MESSAGE):
+                            query_cache.add(prompt, (rag_context, search_context))
+                        if rag_context is None:
+                            rag_context = RAG_ERROR_MESSAGE
+                        if search_context is None:
+                            search_context = WEB_SEARCH_ERROR_MESSAGE
+
+                # 3. Construct a detailed system prompt with all context
+                system_prompt = f"""
+                You are an expert AI real estate assistant for Bangalore. Your goal is to help the user find a rental property.
+                You must use the provided context to answer the user's query.
+
+                **Response Mode:** Please provide a {response_mode} response.
+
+                **Context from my Knowledge Base (Neighborhood Info & Listings):**
+                ---
+                {rag_context}
+                ---
+
+                **Context from a Live Web Search (Current Info):**
+                ---
+                {search_context}
+                ---
+
+                Based on all the above information, answer the user's query.
+                Synthesize the information from the knowledge base and the web search into a single, helpful, conversational response.
+                If you use information from the web, mention that it's from a "real-time search."
+                """
+
+                try:
+                    # Prepare messages for the model
+                    formatted_messages = [SystemMessage(content=system_prompt)]
+                    formatted_messages.extend(get_history_for_llm(st.session_state.messages))
+
+                    # --- NEW FEATURE: Check for Neighborhood Match Score ---
+                    # The score prompt doesn't depend on the main answer, so it is built up front
+                    mentioned_area = None
+                    score_messages = None
+                    score_error = None
+                    if st.session_state.user_preferences:
+                        # Find which area was mentioned
+                        match = AREA_RE.search(prompt_lc)
+                        mentioned_area = match.group(1) if match else None
+
+                        if mentioned_area:
+                            try:
+                                # Load neighborhood description
+                                neighborhood_desc = load_neighborhood(mentioned_area)
+
+                                score_prompt = f"""
+                                Based on the user's preferences and the neighborhood description, provide a match score.
+                                User Preferences: "{st.session_state.user_preferences}"
+                                Neighborhood Description for {mentioned_area.title()}: "{neighborhood_desc}"
+                                
+                                On a scale of 1 to 10, how well does this neighborhood match the user's preferences?
+                                Provide the score and a single, concise sentence explaining your reasoning.
+                                Format your response as: **Match Score for {mentioned_area.title()}: [Score]/10** \n [Your reasoning].
+                                """
+                                score_messages = [HumanMessage(content=score_prompt)]
+                            except Exception as e:
+                                score_error = e
+
+                    # Start the match score on the background loop while the main answer streams
+                    score_future = run_async_in_background(small_chat_model.ainvoke(score_messages)) if score_messages else None
+
+                    # Stream the main response as its tokens arrive
+                    response_content = st.write_stream(
+                        chunk.content for chunk in chat_model.stream(formatted_messages)
+                    )
+
+                    if mentioned_area:
+                        with st.spinner(f"Calculating match score for {mentioned_area.title()}..."):
+                            if score_future is not None:
+                                try:
+                                    score_content = score_future.result().content
+                                except Exception as e:
+                                    score_error = e
+                            if score_error is not None:
+                                score_content = f"Could not calculate match score due to an error: {score_error}"
+
+                        # Append the score to the main response
+                        st.markdown("---\n\n" + score_content)
+                        response_content += "\n\n---\n\n" + score_content
+
+                except Exception as e:
+                    response_content = f"Sorry, I encountered an error: {e}"
                     st.markdown(response_content)
-                    st.session_state.messages.append(AIMessage(content=response_content))
+
+                st.session_state.messages.append(AIMessage(content=response_content))
+                # Fold older turns into the summary in the background, ready for the next turn
+                schedule_history_summary(st.session_state.messages, small_chat_model)
 
 # --- Main App Execution ---
 def main():
@@ -1,25 +1,81 @@
-from langchain_community.embeddings import HuggingFaceEmbeddings
+import os
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from optimum.onnxruntime import ORTModelForFeatureExtraction, ORTQuantizer
+from optimum.onnxruntime.configuration import AutoQuantizationConfig
+from transformers import AutoTokenizer
 
-def get_huggingface_embeddings(model_name="all-MiniLM-L6-v2"):
+# Define the path where the exported, int8-quantized ONNX model will be stored
+ONNX_MODEL_PATH = "onnx_model"
+ONNX_MODEL_FILE = "model_quantized.onnx"
+
+class ONNXEmbeddings(Embeddings):
+    """
+    Sentence-transformer embeddings computed with ONNX Runtime on an int8-quantized model.
+    Mirrors the sentence-transformers pipeline (mean pooling + L2 normalization).
     """
-    Loads a pre-trained sentence-transformer model from HuggingFace.
+
+    def __init__(self, model_path, max_length=256, batch_size=64):
+        self.tokenizer = AutoTokenizer.from_pretrained(model_path)
+        self.model = ORTModelForFeatureExtraction.from_pretrained(model_path, file_name=ONNX_MODEL_FILE)
+        self.max_length = max_length
+        self.batch_size = batch_size
+
+    def _embed(self, texts):
+        inputs = self.tokenizer(
+            texts, padding=True, truncation=True, max_length=self.max_length, return_tensors="np"
+        )
+        token_embeddings = self.model(**inputs).last_hidden_state
+
+        # Mean pooling over the non-padding tokens
+        mask = inputs["attention_mask"][..., np.newaxis].astype(np.float32)
+        pooled = (token_embeddings * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+
+        # Normalize so that inner product equals cosine similarity
+        pooled /= np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None)
+        return pooled.tolist()
+
+    def embed_documents(self, texts):
+        # Encode in fixed-size batches so each forward pass is one batched matmul
+        texts = list(texts)
+        vectors = []
+        for start in range(0, len(texts), self.batch_size):
+            vectors.extend(self._embed(texts[start:start + self.batch_size]))
+        return vectors
+
+    def embed_query(self, text):
+        return self._embed([text])[0]
+
+
+def export_quantized_model(model_name, save_dir, model_class=ORTModelForFeatureExtraction):
+    """Exports a HuggingFace model to ONNX and applies dynamic int8 quantization."""
+    model = model_class.from_pretrained(model_name, export=True)
+    quantizer = ORTQuantizer.from_pretrained(model)
+    quantization_config = AutoQuantizationConfig.avx2(is_static=False, per_channel=False)
+    quantizer.quantize(save_dir=save_dir, quantization_config=quantization_config)
+    AutoTokenizer.from_pretrained(model_name).save_pretrained(save_dir)
+
+
+def get_huggingface_embeddings(model_name="sentence-transformers/all-MiniLM-L6-v2"):
+    """
+    Loads a pre-trained sentence-transformer model from HuggingFace as an int8 ONNX model.
 
     Args:
         model_name (str): The name of the model to load.
 
     Returns:
-        HuggingFaceEmbeddings: The loaded embedding model object.
+        ONNXEmbeddings: The loaded embedding model object.
     """
     try:
-        # Initialize the embedding model. It will be downloaded automatically if not cached.
-        embeddings = HuggingFaceEmbeddings(
-            model_name=model_name,
-            model_kwargs={'device': 'cpu'} # Use CPU for broad compatibility
-        )
+        # Export and quantize the model once. It will be downloaded automatically if not cached.
+        if not os.path.exists(os.path.join(ONNX_MODEL_PATH, ONNX_MODEL_FILE)):
+            print("Quantized ONNX model not found. Exporting a new one...")
+            export_quantized_model(model_name, ONNX_MODEL_PATH)
+
+        embeddings = ONNXEmbeddings(ONNX_MODEL_PATH)
         print("Embedding model loaded successfully.")
         return embeddings
     except Exception as e:
         print(f"Error loading embedding model: {e}")
         # Propagate the error to be handled by the main app
         raise RuntimeError(f"Failed to load embedding model: {e}")
-
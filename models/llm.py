@@ -1,6 +1,8 @@
 import os
 import sys
 from langchain_groq import ChatGroq
+from langchain_core.globals import set_llm_cache
+from langchain_community.cache import SQLiteCache
 
 # This line ensures Python can find the 'config' folder
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
@@ -9,7 +11,11 @@ sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')
 # We now directly import the variable we need from the config file
 from config.config import GROQ_API_KEY
 
-def get_chatgroq_model():
+# Persist LLM responses so identical prompts (e.g. repeated match scores) skip the Groq round-trip
+LLM_CACHE_PATH = ".langchain.db"
+set_llm_cache(SQLiteCache(database_path=LLM_CACHE_PATH))
+
+def get_chatgroq_model(model_name="llama3-70b-8192"):
     """Initialize and return the Groq chat model"""
     try:
         # Check if the API key was successfully imported
@@ -19,11 +25,14 @@ def get_chatgroq_model():
         # Initialize the Groq chat model with the imported API key
         groq_model = ChatGroq(
             api_key=GROQ_API_KEY, # Use the imported variable directly
-            model="llama3-70b-8192", # Using a more standard and powerful model
+            model=model_name, # Defaults to a more standard and powerful model
         )
-        print("Groq model initialized successfully.")
+        print(f"Groq model {model_name} initialized successfully.")
         return groq_model
     except Exception as e:
         # This will now pass a more informative error message to the Streamlit app
         raise RuntimeError(f"Failed to initialize Groq model: {str(e)}")
 
+def get_chatgroq_small_model():
+    """Initialize and return a small, fast Groq chat model for short classification-style tasks"""
+    return get_chatgroq_model(model_name="llama-3.1-8b-instant")
@@ -0,0 +1,58 @@
+import os
+import numpy as np
+from optimum.onnxruntime import ORTModelForSequenceClassification
+from transformers import AutoTokenizer
+from models.embeddings import export_quantized_model, ONNX_MODEL_FILE
+
+# Define the path where the exported, int8-quantized ONNX reranker will be stored
+ONNX_RERANKER_PATH = "onnx_reranker"
+
+class ONNXCrossEncoder:
+    """
+    Cross-encoder relevance scores computed with ONNX Runtime on an int8-quantized model.
+    Exposes the same predict() interface as sentence-transformers' CrossEncoder.
+    """
+
+    def __init__(self, model_path, max_length=512, batch_size=32):
+        self.tokenizer = AutoTokenizer.from_pretrained(model_path)
+        self.model = ORTModelForSequenceClassification.from_pretrained(model_path, file_name=ONNX_MODEL_FILE)
+        self.max_length = max_length
+        self.batch_size = batch_size
+
+    def predict(self, pairs):
+        """Returns one relevance score per (query, passage) pair."""
+        pairs = list(pairs)
+        scores = []
+        for start in range(0, len(pairs), self.batch_size):
+            queries, passages = zip(*pairs[start:start + self.batch_size])
+            inputs = self.tokenizer(
+                list(queries), list(passages),
+                padding=True, truncation=True, max_length=self.max_length, return_tensors="np"
+            )
+            scores.append(self.model(**inputs).logits.reshape(-1))
+        return np.concatenate(scores) if scores else np.array([], dtype=np.float32)
+
+
+def get_cross_encoder_reranker(model_name="cross-encoder/ms-marco-MiniLM-L-6-v2"):
+    """
+    Loads a pre-trained cross-encoder from HuggingFace as an int8 ONNX model for reranking retrieved chunks.
+
+    Args:
+        model_name (str): The name of the model to load.
+
+    Returns:
+        ONNXCrossEncoder: The loaded reranker model object.
+    """
+    try:
+        # Export and quantize the model once. It will be downloaded automatically if not cached.
+        if not os.path.exists(os.path.join(ONNX_RERANKER_PATH, ONNX_MODEL_FILE)):
+            print("Quantized ONNX reranker not found. Exporting a new one...")
+            export_quantized_model(model_name, ONNX_RERANKER_PATH, model_class=ORTModelForSequenceClassification)
+
+        reranker = ONNXCrossEncoder(ONNX_RERANKER_PATH)
+        print("Reranker model loaded successfully.")
+        return reranker
+    except Exception as e:
+        print(f"Error loading reranker model: {e}")
+        # Propagate the error to be handled by the main app
+        raise RuntimeError(f"Failed to load reranker model: {e}")
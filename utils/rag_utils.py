@@ -1,11 +1,37 @@
+import io
 import os
+import threading
+import time
+import uuid
+from collections import deque
+from functools import lru_cache
+import faiss
+import numpy as np
 from langchain_community.vectorstores import FAISS
+from langchain_community.docstore.in_memory import InMemoryDocstore
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain_community.document_loaders import DirectoryLoader, CSVLoader
 
 # Define the path where the pre-computed index will be stored
 FAISS_INDEX_PATH = "faiss_index"
 
+# HNSW graph parameters: neighbors per node, and build/query-time candidate list sizes
+HNSW_M = 32
+HNSW_EF_CONSTRUCTION = 200
+HNSW_EF_SEARCH = 64
+
+# Separator placed between retrieved chunks in the RAG context
+RAG_CONTEXT_SEPARATOR = "\n\n---\n\n"
+
+# Shown to the LLM in place of RAG context when retrieval fails
+RAG_ERROR_MESSAGE = "Could not retrieve context due to an error."
+
+def _set_search_params(vector_store):
+    """Applies query-time parameters to the underlying FAISS index."""
+    if isinstance(vector_store.index, faiss.IndexHNSW):
+        vector_store.index.hnsw.efSearch = HNSW_EF_SEARCH
+
+
 def get_or_create_vector_store(folder_path, embeddings):
     """
     Loads a pre-existing FAISS vector store if it exists. If not, it creates
@@ -21,6 +47,7 @@ def get_or_create_vector_store(folder_path, embeddings):
             embeddings,
             allow_dangerous_deserialization=True 
         )
+        _set_search_params(vector_store)
         print("FAISS index loaded successfully.")
         return vector_store
     else:
@@ -49,9 +76,26 @@ def get_or_create_vector_store(folder_path, embeddings):
             text_splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=150)
             texts = text_splitter.split_documents(all_documents)
 
-            # Create the vector store
+            # Embed all chunks in batches
             print("Creating vector store from all documents...")
-            vector_store = FAISS.from_documents(texts, embeddings)
+            vectors = np.asarray(
+                embeddings.embed_documents([text.page_content for text in texts]),
+                dtype=np.float32
+            )
+
+            # Build an HNSW graph index for sublinear nearest-neighbor search
+            index = faiss.IndexHNSWFlat(vectors.shape[1], HNSW_M)
+            index.hnsw.efConstruction = HNSW_EF_CONSTRUCTION
+            index.add(vectors)
+
+            doc_ids = [str(uuid.uuid4()) for _ in texts]
+            vector_store = FAISS(
+                embedding_function=embeddings,
+                index=index,
+                docstore=InMemoryDocstore(dict(zip(doc_ids, texts))),
+                index_to_docstore_id=dict(enumerate(doc_ids))
+            )
+            _set_search_params(vector_store)
             
             # --- SAVE THE NEW INDEX ---
             # Save the newly created index to the specified path for future runs
@@ -64,18 +108,111 @@ def get_or_create_vector_store(folder_path, embeddings):
             raise RuntimeError(f"Failed to create vector store: {e}")
 
 
-def get_context_from_rag(vector_store, query, k=5):
+@lru_cache(maxsize=512)
+def _embed_query(vector_store, query):
+    """
+    Embeds a query with the vector store's embedding model, memoizing the result
+    so repeated queries skip the transformer forward pass.
+    """
+    return tuple(vector_store.embeddings.embed_query(query))
+
+
+def get_context_from_rag(vector_store, query, k=5, reranker=None, fetch_k=50):
     """
     Performs a similarity search on the vector store to find relevant document chunks.
-    (This function remains unchanged)
+    If a cross-encoder reranker is given, fetch_k candidates are retrieved and the
+    k best-scoring ones are kept. Returns None if retrieval fails.
     """
     if not vector_store:
-        return "Vector store is not available."
+        return None
     try:
-        retriever = vector_store.as_retriever(search_kwargs={"k": k})
-        relevant_docs = retriever.get_relevant_documents(query)
-        context = "\n\n---\n\n".join([doc.page_content for doc in relevant_docs])
-        return context
+        query_vector = list(_embed_query(vector_store, query))
+        if reranker is None:
+            relevant_docs = vector_store.similarity_search_by_vector(query_vector, k=k)
+        else:
+            candidates = vector_store.similarity_search_by_vector(query_vector, k=fetch_k)
+            try:
+                scores = reranker.predict([(query, doc.page_content) for doc in candidates])
+                relevant_docs = [candidates[i] for i in np.argsort(scores)[::-1][:k]]
+            except Exception as e:
+                # Keep the dense ranking rather than losing the context altogether
+                print(f"Error reranking RAG candidates: {e}")
+                relevant_docs = candidates[:k]
+        # Write the chunks into one buffer instead of materializing a list of them
+        context = io.StringIO()
+        for i, doc in enumerate(relevant_docs):
+            if i:
+                context.write(RAG_CONTEXT_SEPARATOR)
+            context.write(doc.page_content)
+        return context.getvalue()
     except Exception as e:
         print(f"Error retrieving context from RAG: {e}")
-        return "Could not retrieve context due to an error."
+        return None
+
+
+class SemanticQueryCache:
+    """
+    Remembers the contexts fetched for recent queries and returns them again for
+    near-duplicate queries, matched by cosine similarity of the query embeddings.
+    Entries expire ttl seconds after they were added.
+    """
+
+    def __init__(self, vector_store, threshold=0.95, maxlen=256, ttl=3600):
+        self.vector_store = vector_store
+        self.threshold = threshold
+        self.maxlen = maxlen
+        self.ttl = ttl
+        self.index = None
+        self.entries = deque()
+        # The cache is shared by every Streamlit session, so guard the index
+        self.lock = threading.Lock()
+
+    def _vector(self, query):
+        vector = np.asarray([_embed_query(self.vector_store, query)], dtype=np.float32)
+        faiss.normalize_L2(vector)
+        return vector
+
+    def _evict_oldest(self):
+        # Removing id 0 shifts the remaining ids down, matching the deque
+        self.index.remove_ids(np.array([0], dtype=np.int64))
+        self.entries.popleft()
+
+    def _evict_expired(self):
+        # Entries are kept in insertion order, so expired ones are always at the front
+        now = time.monotonic()
+        while self.entries and now - self.entries[0][0] > self.ttl:
+            self._evict_oldest()
+
+    def lookup(self, query):
+        """Returns the cached value for the most similar past query, or None."""
+        try:
+            vector = self._vector(query)
+        except Exception as e:
+            # Treat a failed embedding as a cache miss so the turn can still fetch normally
+            print(f"Error embedding query for the semantic cache: {e}")
+            return None
+        with self.lock:
+            self._evict_expired()
+            if not self.entries:
+                return None
+            scores, ids = self.index.search(vector, 1)
+            if scores[0][0] >= self.threshold:
+                return self.entries[ids[0][0]][1]
+        return None
+
+    def add(self, query, value):
+        """Caches a value for the query, evicting the oldest entry when full."""
+        try:
+            vector = self._vector(query)
+        except Exception as e:
+            # Skip caching rather than failing the turn that produced the value
+            print(f"Error embedding query for the semantic cache: {e}")
+            return
+        with self.lock:
+            if self.index is None:
+                self.index = faiss.IndexFlatIP(vector.shape[1])
+            self._evict_expired()
+            if len(self.entries) >= self.maxlen:
+                self._evict_oldest()
+            self.index.add(vector)
+            self.entries.append((time.monotonic(), value))
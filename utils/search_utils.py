@@ -1,36 +1,94 @@
-from googleapiclient.discovery import build
+import threading
+import time
+from collections import OrderedDict
+import aiohttp
 from config import config # Assuming you have config.py in the root
 
-def perform_web_search(query, num_results=3):
+# REST endpoint of the Google Custom Search JSON API
+GOOGLE_CSE_URL = "https://www.googleapis.com/customsearch/v1"
+
+# Shown to the LLM in place of web context when the search fails
+WEB_SEARCH_ERROR_MESSAGE = "Sorry, I couldn't perform a web search at the moment due to a configuration issue."
+
+# Successful results are reused for an hour to save CSE quota and round-trips
+SEARCH_CACHE_TTL = 3600
+SEARCH_CACHE_MAX_ENTRIES = 256
+_search_cache = OrderedDict()
+_search_cache_lock = threading.Lock()
+
+def _get_cached_search(key):
+    """Returns a cached search result that hasn't expired yet, or None."""
+    with _search_cache_lock:
+        entry = _search_cache.get(key)
+        if entry is None:
+            return None
+        timestamp, result = entry
+        if time.monotonic() - timestamp > SEARCH_CACHE_TTL:
+            del _search_cache[key]
+            return None
+        return result
+
+def _set_cached_search(key, result):
+    """Caches a search result, evicting the oldest entries past the size limit."""
+    with _search_cache_lock:
+        _search_cache[key] = (time.monotonic(), result)
+        _search_cache.move_to_end(key)
+        while len(_search_cache) > SEARCH_CACHE_MAX_ENTRIES:
+            _search_cache.popitem(last=False)
+
+async def create_search_session():
+    """Creates an aiohttp session bound to the running event loop, for reuse across searches."""
+    return aiohttp.ClientSession()
+
+async def _fetch_results(session, params):
+    """Sends the search request on the given session and returns the parsed JSON."""
+    async with session.get(GOOGLE_CSE_URL, params=params) as response:
+        response.raise_for_status()
+        return await response.json()
+
+async def aperform_web_search(query, num_results=3, session=None):
     """
-    Performs a web search using the Google Custom Search JSON API.
+    Performs a web search using the Google Custom Search JSON API without blocking the event loop.
 
     Args:
         query (str): The search query.
         num_results (int): The number of search results to return.
+        session (aiohttp.ClientSession): Optional long-lived session whose connection
+            pool is reused across searches. A one-off session is used if omitted.
 
     Returns:
-        str: A formatted string of search results, or an error message.
+        str: A formatted string of search results, or None if the search failed.
     """
     try:
         # Check for necessary API keys and IDs in the config
         if not config.GOOGLE_API_KEY or not config.GOOGLE_CSE_ID:
             return "Web search is not configured. Missing Google API Key or CSE ID."
 
-        # Build the custom search service
-        service = build("customsearch", "v1", developerKey=config.GOOGLE_API_KEY)
-        
-        # Execute the search query
-        res = service.cse().list(
-            q=query,
-            cx=config.GOOGLE_CSE_ID,
-            num=num_results
-        ).execute()
+        cache_key = (query, num_results)
+        cached_result = _get_cached_search(cache_key)
+        if cached_result is not None:
+            return cached_result
+
+        params = {
+            "key": config.GOOGLE_API_KEY,
+            "cx": config.GOOGLE_CSE_ID,
+            "q": query,
+            "num": num_results,
+        }
+
+        # Execute the search query against the REST endpoint directly
+        if session is None:
+            async with aiohttp.ClientSession() as one_off_session:
+                res = await _fetch_results(one_off_session, params)
+        else:
+            res = await _fetch_results(session, params)
 
         # Format the results
         items = res.get('items', [])
         if not items:
-            return "No relevant search results found from the web."
+            result = "No relevant search results found from the web."
+            _set_cached_search(cache_key, result)
+            return result
 
         # Extract title, link, and snippet for each result
         search_results = []
@@ -40,10 +98,11 @@ def perform_web_search(query, num_results=3):
             snippet = item.get('snippet', 'No Snippet').replace('\n', ' ')
             search_results.append(f"Title: {title}\nSnippet: {snippet}\nLink: {link}")
 
-        return "\n\n---\n\n".join(search_results)
+        result = "\n\n---\n\n".join(search_results)
+        _set_cached_search(cache_key, result)
+        return result
 
     except Exception as e:
         print(f"Error during web search: {e}")
-        # Provide a user-friendly error message
-        return "Sorry, I couldn't perform a web search at the moment due to a configuration issue."
-
+        # Signal the failure so callers don't cache it as a result
+        return None